@@ -6,6 +6,9 @@ Output formats:
 - JSONL (default): one JSON object per line (stream-friendly for huge files)
 - JSON array: a single JSON array (use --format json)
 
+Rows are generated in chunks and streamed to the writer: only the NodeId and level of each row
+(about 45 bytes) are kept for parent lookups, every other field lives only for its chunk.
+
 Each record schema:
 {
   "timestamp": "2025-07-14T09:51:36.000Z",
@@ -19,38 +22,106 @@ Key guarantees:
 - NodeId, SessionId are UUID-like 36-char strings (8-4-4-4-12).
 - Source is either "CDN" (root/default) or the NodeId of a previously-created node -> no cycles.
 - You control scale and shape via CLI options.
+
+If orjson is installed it is used for encoding; otherwise the stdlib json module is used.
+If ijson is installed, JSON arrays are streamed instead of loaded fully for CSV conversion.
+An --out path ending in .zst is compressed on the fly with zstandard (e.g. nodes.jsonl.zst).
 """
 
 import argparse
 import json
 import math
+import multiprocessing
+import os
 import random
 import sys
-import uuid
 import csv
+import io
+from collections import deque
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
-
-ISO_Z = "%Y-%m-%dT%H:%M:%S.000Z"
-
-
-def gen_uuid() -> str:
-    # Standard UUIDv4 string format (36 chars: 8-4-4-4-12, lowercase)
-    return str(uuid.uuid4())
-
-
-def random_timestamp(start: datetime, end: datetime) -> str:
-    # uniform timestamp between start and end
-    delta = end - start
-    total_seconds = delta.total_seconds()
-    r = random.random()
-    t = start + timedelta(seconds=r * total_seconds)
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to stdlib json
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional; JSON arrays are then loaded fully for CSV conversion
+    ijson = None
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed for .zst output paths
+    zstandard = None
+
+# Source of root nodes; one interned object shared by every root row
+ROOT_SOURCE = sys.intern("CDN")
+CSV_FIELDS = ["timestamp", "NodeId", "BufferHealth", "SessionId", "Source"]
+# Encoded output is accumulated and flushed in chunks of this size.
+WRITE_BUFFER_SIZE = 1 << 20
+# zstd level for .zst output: favours throughput over ratio.
+ZSTD_LEVEL = 3
+# Rows generated per batch; bounds the memory held for fields other than NodeId/level.
+GENERATE_CHUNK_SIZE = 10_000
+
+
+# Length of a formatted UUID string (8-4-4-4-12)
+UUID_LEN = 36
+# Maps a random hex digit to an RFC 4122 variant digit (10xx -> 8, 9, a or b)
+_UUID_VARIANT = {c: "89ab"[int(c, 16) & 3] for c in "0123456789abcdef"}
+
+
+def gen_uuids(count: int) -> List[str]:
+    # Standard UUIDv4 strings (36 chars: 8-4-4-4-12, lowercase), formatted in bulk from
+    # a single os.urandom draw instead of building `count` uuid.UUID objects.
+    h = os.urandom(16 * count).hex()
+    variant = _UUID_VARIANT
+    return [
+        f"{h[o:o + 8]}-{h[o + 8:o + 12]}-4{h[o + 13:o + 16]}-{variant[h[o + 16]]}{h[o + 17:o + 20]}-{h[o + 20:o + 32]}"
+        for o in range(0, 32 * count, 32)
+    ]
+
+
+def parse_iso_z(ts: str) -> datetime:
+    # UTC datetime from an ISO timestamp such as 2025-07-14T09:51:36.000Z. fromisoformat is
+    # implemented in C, unlike strptime; it only accepts a "Z" suffix from Python 3.11 on.
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    dt = datetime.fromisoformat(ts)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def random_timestamps(start: datetime, end: datetime, n: int, rng: random.Random) -> List[str]:
+    # n uniform timestamps between start and end, drawn in one pass.
+    # Formatted with integer arithmetic instead of datetime + strftime per row: the
+    # "YYYY-MM-DDT" prefix is formatted once per day actually drawn (memoized, so at most
+    # min(n, days in range) strftime calls), only the time of day is formatted per row.
+    total_seconds = (end - start).total_seconds()
     # Zero out microseconds and force ".000Z"
-    t = t.replace(microsecond=0, tzinfo=timezone.utc)
-    return t.strftime(ISO_Z)
-
-
-def generate_nodes(
+    start = start.replace(microsecond=0, tzinfo=timezone.utc)
+    start_offset = start.hour * 3600 + start.minute * 60 + start.second
+    start_date = start.date()
+    day_prefixes = {}
+
+    _rand = rng.random
+    timestamps = [None] * n
+    for k in range(n):
+        day, rem = divmod(start_offset + int(_rand() * total_seconds), 86400)
+        prefix = day_prefixes.get(day)
+        if prefix is None:
+            prefix = day_prefixes[day] = (start_date + timedelta(days=day)).strftime("%Y-%m-%dT")
+        hour, rem = divmod(rem, 3600)
+        minute, second = divmod(rem, 60)
+        timestamps[k] = "%s%02d:%02d:%02d.000Z" % (prefix, hour, minute, second)
+    return timestamps
+
+
+def generate_node_chunks(
     n: int,
     root_share: float = 0.1,
     max_children_hint: int = 6,
@@ -60,124 +131,309 @@ def generate_nodes(
     end_ts: str = "2025-12-31T23:59:59.000Z",
     max_level_tree: int = 100,
     seed: Optional[int] = None,
-):
+    chunk_size: int = GENERATE_CHUNK_SIZE,
+    workers: int = 1,
+) -> Iterator[Dict[str, Sequence]]:
     """
-    Generate nodes with acyclic parent references.
+    Generate nodes with acyclic parent references, as consecutive column chunks of at most
+    `chunk_size` rows (one sequence per field, see `iter_rows`).
     Strategy:
     - Create nodes sequentially. For node i>0, choose Source="CDN" with probability `root_share`,
       else pick a parent uniformly from nodes [0..i-1]. This ensures no cycles by construction.
     - `max_children_hint` lightly influences the chance to choose "CDN" vs a parent by adapting
       root_share as the graph grows; keeping it simple here for performance and clarity.
+    Only NodeId and the tree level are kept for the whole run (needed to resolve parents); every
+    other field lives as long as its chunk. Levels are internal bookkeeping and not part of
+    the output records.
+    Fields that don't depend on the tree shape are drawn per chunk, in `workers` processes
+    when workers > 1; each chunk has its own RNG derived from `seed`, so a given seed yields
+    the same tree shape, timestamps and BufferHealth whatever the number of workers.
+    NodeId and SessionId come from os.urandom and are never reproducible.
+    Arguments are validated eagerly, before the first chunk is requested.
     """
-    if seed is not None:
-        random.seed(seed)
-
     try:
-        start_dt = datetime.strptime(start_ts, ISO_Z).replace(tzinfo=timezone.utc)
-        end_dt = datetime.strptime(end_ts, ISO_Z).replace(tzinfo=timezone.utc)
+        start_dt = parse_iso_z(start_ts)
+        end_dt = parse_iso_z(end_ts)
     except ValueError:
         raise SystemExit("Invalid timestamp format. Use ISO like 2025-07-14T09:51:36.000Z")
 
     if end_dt <= start_dt:
         raise SystemExit("--end-ts must be after --start-ts")
 
-    nodes = []
-    nodes_append = nodes.append
+    tasks = [
+        (
+            offset,
+            min(chunk_size, n - offset),
+            None if seed is None else f"{seed}:{offset // chunk_size}",
+            root_share,
+            start_dt,
+            end_dt,
+            buffer_min,
+            buffer_max,
+        )
+        for offset in range(0, n, chunk_size)
+    ]
+    return _node_chunks(n, max_level_tree, chunk_size, seed, _draw_chunks(tasks, workers))
+
+
+def _draw_chunk(task: tuple) -> tuple:
+    # Tree-independent columns of one chunk; a module-level function so worker processes can run it
+    offset, size, chunk_seed, root_share, start_dt, end_dt, buffer_min, buffer_max = task
+    rng = random.Random(chunk_seed)
+    _rand = rng.random
+    _uniform = rng.uniform
+
+    timestamps = random_timestamps(start_dt, end_dt, size, rng)
+    # buffer health uniform float; keep 2 decimals for readability while still float
+    buffer_healths = array("d", [round(_uniform(buffer_min, buffer_max), 2) for _ in range(size)])
+    node_ids = gen_uuids(size)
+    session_ids = gen_uuids(size)
+    # First parent draw of each row i, or -1 for a root: only redraws are left to the serial loop.
+    # int(u * i) is uniform over [0, i - 1] and much cheaper than randint.
+    first_parents = array(
+        "i", [-1 if _rand() < root_share else int(_rand() * i) for i in range(offset, offset + size)]
+    )
+    if offset == 0:
+        first_parents[0] = -1
+    return timestamps, buffer_healths, node_ids, session_ids, first_parents
+
+
+def _draw_chunks(tasks: List[tuple], workers: int) -> Iterator[tuple]:
+    # Yield drawn chunks in order; with workers > 1 keep at most `workers` chunks in flight
+    # ahead of the consumer so memory stays bounded.
+    if workers <= 1:
+        yield from map(_draw_chunk, tasks)
+        return
 
-    notes_under_max_level = []
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_draw_chunk, (task,)))
+            if len(pending) > workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _node_chunks(
+    n: int,
+    max_level_tree: int,
+    chunk_size: int,
+    seed: Optional[int],
+    drawn_chunks: Iterator[tuple],
+) -> Iterator[Dict[str, Sequence]]:
+    # Sized once since n is known upfront. NodeIds are kept for parent lookups as packed
+    # 36-byte ASCII slots rather than str objects (~90 bytes each): this is all the generator
+    # retains per row, along with its level.
+    node_ids = bytearray(UUID_LEN * n)
+    levels = array("i", bytes(4 * n))
+
+    # Indices of nodes that can still take a child without exceeding max_level_tree,
+    # packed at 4 bytes per entry
+    notes_under_max_level = array("i")
     notes_under_max_level_append = notes_under_max_level.append
+    # With a single level allowed every node has to be a root
+    can_nest = max_level_tree > 1
 
-    for i in range(n):
-        node_id = gen_uuid()
-        session_id = gen_uuid()
-        # buffer health uniform float; keep 2 decimals for readability while still float
-        buffer_health = round(random.uniform(buffer_min, buffer_max), 2)
-        ts = random_timestamp(start_dt, end_dt)
-        level = 1
+    # Only used for the capped-parent fallback; bound to avoid an attribute lookup per call
+    rng = random.Random(seed)
+    _choice = rng.choice
 
-        if i == 0 or random.random() < root_share:
-            source = "CDN"
-        else:
-            # Choose a parent from previously created nodes (acyclic guarantee)
-            parent_index = random.randint(0, i - 1)
-            if nodes[parent_index]["level"] <= max_level_tree - 1:
-                level = nodes[parent_index]["level"] + 1
-                source = nodes[parent_index]["NodeId"]
+    for offset, drawn in zip(range(0, n, chunk_size), drawn_chunks):
+        end = min(offset + chunk_size, n)
+        size = end - offset
+
+        # Timestamps, buffer health, ids and rolls don't depend on the tree shape: drawn in bulk.
+        timestamps, buffer_healths, chunk_node_ids, session_ids, first_parents = drawn
+        node_ids[UUID_LEN * offset:UUID_LEN * end] = "".join(chunk_node_ids).encode("ascii")
+        sources = [None] * size
+
+        for i in range(offset, end):
+            level = 1
+            j = i - offset
+
+            parent_index = first_parents[j]
+            if parent_index < 0 or not can_nest:
+                source = ROOT_SOURCE
             else:
-                node_under_max_level_rdm = random.choice(notes_under_max_level)
-                level = node_under_max_level_rdm["level"] + 1
-                source = node_under_max_level_rdm["NodeId"]
+                # Choose a parent from previously created nodes (acyclic guarantee); if it is
+                # already at max_level_tree, pick uniformly among the nodes still under the cap.
+                if levels[parent_index] >= max_level_tree:
+                    parent_index = _choice(notes_under_max_level)
+                level = levels[parent_index] + 1
+                source = node_ids[UUID_LEN * parent_index:UUID_LEN * (parent_index + 1)].decode("ascii")
+
+            sources[j] = source
+            levels[i] = level
+
+            if level < max_level_tree:
+                notes_under_max_level_append(i)
+
+        yield {
+            "timestamp": timestamps,
+            "NodeId": chunk_node_ids,
+            "BufferHealth": buffer_healths,
+            "SessionId": session_ids,
+            "Source": sources,
+        }
+
 
-        to_append = {
+def generate_nodes_iter(*args, **kwargs) -> Iterator[dict]:
+    """Stream generated records one dict at a time; takes the same arguments as `generate_node_chunks`."""
+    chunks = generate_node_chunks(*args, **kwargs)
+    return (row for chunk in chunks for row in iter_rows(chunk))
+
+
+def generate_nodes(*args, **kwargs) -> Dict[str, Sequence]:
+    """Materialize the whole dataset as columns; takes the same arguments as `generate_node_chunks`."""
+    columns = {}
+    for chunk in generate_node_chunks(*args, **kwargs):
+        for key, values in chunk.items():
+            if key in columns:
+                columns[key] += values
+            else:
+                columns[key] = values
+    return columns
+
+
+def iter_rows(columns: Dict[str, Sequence]) -> Iterator[dict]:
+    """Yield one record dict per row from a set of columns (see `generate_node_chunks`)."""
+    # Records are only materialized here, right before serialization. The schema is fixed, so
+    # a dict literal is used: about 3x cheaper than dict(zip(keys, values)) per row.
+    for ts, node_id, buffer_health, session_id, source in zip(
+        columns["timestamp"],
+        columns["NodeId"],
+        columns["BufferHealth"],
+        columns["SessionId"],
+        columns["Source"],
+    ):
+        yield {
             "timestamp": ts,
             "NodeId": node_id,
             "BufferHealth": buffer_health,
             "SessionId": session_id,
             "Source": source,
-            "level": level,
         }
 
-        nodes_append(to_append)
 
-        if level < max_level_tree:
-            notes_under_max_level_append(to_append)
+def open_output(path: str):
+    """Open `path` for binary writing, zstd-compressed on the fly when it ends with .zst."""
+    if not path.endswith(".zst"):
+        return open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+    if zstandard is None:
+        raise SystemExit("Writing .zst output requires the zstandard package")
+    # threads=-1: compress on all cores, concurrently with encoding
+    cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    return cctx.stream_writer(open(path, "wb"))
+
 
-    return nodes
+def open_input(path: str):
+    """Open `path` for binary reading, decompressing on the fly when it ends with .zst."""
+    if not path.endswith(".zst"):
+        return open(path, "rb")
+    if zstandard is None:
+        raise SystemExit("Reading .zst input requires the zstandard package")
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")))
 
 
-def write_jsonl(path: str, rows: List[dict]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
+def dumps_row(row: dict) -> bytes:
+    # UTF-8 encoded JSON for a single row; orjson when available, stdlib otherwise.
+    if orjson is not None:
+        return orjson.dumps(row)
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_jsonl(path: str, rows: Iterable[dict]) -> None:
+    # Fed by generate_nodes_iter, each row is generated, encoded and buffered in a single pass;
+    # the dataset is never held in memory.
+    with open_output(path) as f:
+        buf = bytearray()
         for row in rows:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            buf += dumps_row(row)
+            buf += b"\n"
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
 
 
-def write_json_array(path: str, rows: List[dict]) -> None:
+def write_json_array(path: str, rows: Iterable[dict]) -> None:
     # Stream-friendly array writing for large lists without holding a giant string.
-    with open(path, "w", encoding="utf-8") as f:
-        f.write("[\n")
+    with open_output(path) as f:
+        buf = bytearray(b"[\n")
         first = True
         for row in rows:
             if not first:
-                f.write(",\n")
-            json.dump(row, f, ensure_ascii=False)
+                buf += b",\n"
+            buf += dumps_row(row)
             first = False
-        f.write("\n]\n")
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                f.write(buf)
+                buf.clear()
+        buf += b"\n]\n"
+        f.write(buf)
+
+
+def iter_json_array(infile) -> Iterator[dict]:
+    """Yield the items of a JSON array file, streamed with ijson when it is installed."""
+    with open_input(infile) as fin:
+        if ijson is not None:
+            yield from ijson.items(fin, "item", use_float=True)
+        elif orjson is not None:
+            yield from orjson.loads(fin.read())
+        else:
+            yield from json.loads(fin.read())
 
 
 def json_array_to_csv(infile, outfile):
-    """Convert JSON array (loaded fully) to CSV."""
-    with open(infile, "r", encoding="utf-8") as fin:
-        data = json.load(fin)
-
-    if not data:
+    """Convert JSON array to CSV (streaming with ijson, otherwise loaded fully)."""
+    rows = iter_json_array(infile)
+    first = next(rows, None)
+    if first is None:
         print("⚠️ No rows found")
         return
 
-    headers_clue = ["timestamp","NodeId","BufferHealth","SessionId","Source"]
-    fieldnames = sorted({k for row in data for k in row.keys() if k in headers_clue})
-    data_filtered = json.loads(json.dumps([{key: x[key] for key in fieldnames} for x in data]))
+    # Columns are the documented schema; anything else (e.g. "level" in older files) is dropped
     with open(outfile, "w", newline="", encoding="utf-8") as fout:
-        writer = csv.DictWriter(fout, fieldnames=fieldnames)
+        writer = csv.DictWriter(fout, fieldnames=CSV_FIELDS, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(data_filtered)
+        writer.writerow(first)
+        writer.writerows(rows)
+
+
+def format_csv_line(values: Sequence) -> bytes:
+    # Generated values (ids, ISO timestamps, floats) never need quoting, so join them directly
+    # and only defer to the csv module when some field would.
+    line = ",".join(["" if v is None else str(v) for v in values])
+    if line.count(",") != len(values) - 1 or '"' in line or "\n" in line or "\r" in line:
+        out = io.StringIO()
+        csv.writer(out).writerow(values)
+        return out.getvalue().encode("utf-8")
+    return (line + "\r\n").encode("utf-8")
+
 
 def stream_jsonl_to_csv(infile, outfile):
     """Convert JSONL to CSV line by line (streaming)."""
-    with open(infile, "r", encoding="utf-8") as fin, open(outfile, "w", newline="", encoding="utf-8") as fout:
-        writer = None
+    loads = orjson.loads if orjson is not None else json.loads
+    with open_input(infile) as fin, open(outfile, "wb", buffering=WRITE_BUFFER_SIZE) as fout:
+        fieldnames = None
+        buf = bytearray()
         for line in fin:
             line = line.strip()
             if not line:
                 continue
-            obj = json.loads(line)
+            obj = loads(line)
 
-            if writer is None:
+            if fieldnames is None:
                 # Use keys from the first object
                 fieldnames = list(obj.keys())
-                writer = csv.DictWriter(fout, fieldnames=fieldnames)
-                writer.writeheader()
+                buf += format_csv_line(fieldnames)
 
-            writer.writerow(obj)
+            buf += format_csv_line([obj.get(key, "") for key in fieldnames])
+            if len(buf) >= WRITE_BUFFER_SIZE:
+                fout.write(buf)
+                buf.clear()
+        fout.write(buf)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -189,7 +445,7 @@ def main(argv: Optional[List[str]] = None) -> int:
         default="jsonl",
         help="Output format: jsonl (one object per line) or json (array). Default: jsonl",
     )
-    p.add_argument("--out", type=str, required=True, help="Output file path")
+    p.add_argument("--out", type=str, required=True, help="Output file path (.zst suffix: zstd-compressed)")
     p.add_argument("--root-share", type=float, default=0.1, help="Probability a node uses Source='CDN' (roots).")
     p.add_argument("--max-children-hint", type=int, default=6, help="Not strict; influences structure slightly.")
     p.add_argument("--buffer-min", type=float, default=0.0, help="Min BufferHealth (inclusive)")
@@ -198,6 +454,7 @@ def main(argv: Optional[List[str]] = None) -> int:
     p.add_argument("--end-ts", type=str, default="2025-12-31T23:59:59.000Z", help="Latest timestamp (ISO Z)")
     p.add_argument("--max-level-tree", type=int, default=100, help="Max levels of nodes in the tree")
     p.add_argument("--seed", type=int, default=None, help="Random seed for reproducibility")
+    p.add_argument("--workers", type=int, default=1, help="Processes drawing row fields in parallel")
     p.add_argument("--csv-out", type=str, default='', help="Output CSV file path")
 
     args = p.parse_args(argv)
@@ -208,8 +465,10 @@ def main(argv: Optional[List[str]] = None) -> int:
         raise SystemExit("--root-share must be between 0 and 1")
     if args.buffer_min > args.buffer_max:
         raise SystemExit("--buffer-min cannot exceed --buffer-max")
+    if args.workers <= 0:
+        raise SystemExit("--workers must be positive")
 
-    rows = generate_nodes(
+    rows = generate_nodes_iter(
         n=args.rows,
         root_share=args.root_share,
         max_children_hint=args.max_children_hint,
@@ -219,6 +478,7 @@ def main(argv: Optional[List[str]] = None) -> int:
         end_ts=args.end_ts,
         max_level_tree=args.max_level_tree,
         seed=args.seed,
+        workers=args.workers,
     )
 
     if args.format == "jsonl":
@@ -229,16 +489,16 @@ def main(argv: Optional[List[str]] = None) -> int:
     print(f"✅ Wrote {args.rows} rows to {args.out} as {args.format.upper()}")
 
     if args.csv_out != '':
-        with open(args.out, "r", encoding="utf-8") as f:
-            first_char = f.read(1)
-            f.seek(0)
-
-            if first_char == "[":
-                print("📦 Detected JSON array format (loads full file in memory).")
-                json_array_to_csv(args.out, args.csv_out)
+        # The format of the file just written is known: no need to reopen it and peek
+        if args.format == "json":
+            if ijson is not None:
+                print("📦 Converting JSON array to CSV (streaming with ijson).")
             else:
-                print("📦 Detected JSONL format (streaming line by line).")
-                stream_jsonl_to_csv(args.out, args.csv_out)
+                print("📦 Converting JSON array to CSV (loads full file in memory).")
+            json_array_to_csv(args.out, args.csv_out)
+        else:
+            print("📦 Converting JSONL to CSV (streaming line by line).")
+            stream_jsonl_to_csv(args.out, args.csv_out)
     return 0
 
 